@@ -1,2 +1,2 @@
-from .apophis import Apophis
-from .exchange import Kraken, KrakenFuture
+from .apophis import Apophis, RateLimiter
+from .exchange import Kraken, KrakenFuture, OrderError
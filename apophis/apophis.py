@@ -2,11 +2,13 @@
 import base64
 import hashlib
 import hmac
+import string
 import threading
 import time
 import urllib.parse
 
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import requests
 
@@ -14,65 +16,191 @@ from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 version = "1.0"
 
-API_PUBLIC = {
-    "Time",
-    "Assets",
-    "AssetPairs",
-    "Ticker",
-    "OHLC",
-    "Depth",
-    "Trades",
-    "Spread",
-    # Futures
-    "instruments",
-    "tickers",
-    "orderbook",
-    "history",
-}
-API_PRIVATE_GET = {
-    # Futures
-    "accounts",
-    "openorders",
-    "fills",
-    "openpositions",
-    "transfers",
-    "notifications",
-    "historicorders",
-    "recentorders",
+API_PUBLIC = frozenset(
+    {
+        "Time",
+        "Assets",
+        "AssetPairs",
+        "Ticker",
+        "OHLC",
+        "Depth",
+        "Trades",
+        "Spread",
+        # Futures
+        "instruments",
+        "tickers",
+        "orderbook",
+        "history",
+    }
+)
+API_PRIVATE_GET = frozenset(
+    {
+        # Futures
+        "accounts",
+        "openorders",
+        "fills",
+        "openpositions",
+        "transfers",
+        "notifications",
+        "historicorders",
+        "recentorders",
+    }
+)
+API_PRIVATE_POST = frozenset(
+    {
+        "Balance",
+        "BalanceEx",
+        "TradeBalance",
+        "OpenOrders",
+        "ClosedOrders",
+        "QueryOrders",
+        "TradesHistory",
+        "QueryTrades",
+        "OpenPositions",
+        "Ledgers",
+        "QueryLedgers",
+        "TradeVolume",
+        "AddExport",
+        "ExportStatus",
+        "RetrieveExport",
+        "RemoveExport",
+        "GetWebSocketsToken",
+        "AddOrder",
+        "CancelOrder",
+        "CancelAll",
+        # Futures
+        "transfer",
+        "sendorder",
+        "cancelorder",
+        "cancelallorders",
+        "cancelallordersafter",
+        "batchorder",
+        "withdrawal",
+    }
+)
+API_METHODS = API_PUBLIC | API_PRIVATE_GET | API_PRIVATE_POST
+# HTTP verb and need for authentication of each method
+_METHOD_TABLE = {
+    **{method: ("GET", False) for method in API_PUBLIC},
+    **{method: ("GET", True) for method in API_PRIVATE_GET},
+    **{method: ("POST", True) for method in API_PRIVATE_POST},
 }
-API_PRIVATE_POST = {
-    "Balance",
-    "BalanceEx",
-    "TradeBalance",
-    "OpenOrders",
-    "ClosedOrders",
-    "QueryOrders",
-    "TradesHistory",
-    "QueryTrades",
-    "OpenPositions",
-    "Ledgers",
-    "QueryLedgers",
-    "TradeVolume",
-    "AddExport",
-    "ExportStatus",
-    "RetrieveExport",
-    "RemoveExport",
-    "GetWebSocketsToken",
-    "AddOrder",
-    "CancelOrder",
-    "CancelAll",
-    # Futures
-    "transfer",
-    "sendorder",
-    "cancelorder",
-    "cancelallorders",
-    "cancelallordersafter",
-    "batchorder",
-    "withdrawal",
+
+# Increase of Kraken's call counter, other private methods count for 1
+_METHOD_COST = {
+    "Ledgers": 2,
+    "QueryLedgers": 2,
+    "TradesHistory": 2,
+    "QueryTrades": 2,
+    "AddOrder": 0,
+    "CancelOrder": 0,
+    "CancelAll": 0,
 }
-API_METHODS = API_PUBLIC | API_PRIVATE_GET | API_PRIVATE_POST
+
+# Characters left untouched by ``urllib.parse.quote_plus``
+_URL_SAFE = frozenset(string.ascii_letters + string.digits + "_.-~")
+
+
+def _urlencode(data: Dict) -> str:
+    """Encode a query string, as ``urllib.parse.urlencode``.
+
+    Nonces, pairs, prices and volumes rarely need quoting, in which case
+    the pairs are joined directly.
+
+    Parameters
+    ----------
+    data : dict
+        API request parameters.
+
+    Returns
+    -------
+    query : str
+        Encoded query string.
+
+    """
+    items = [(str(key), str(value)) for key, value in data.items()]
+    if all(_URL_SAFE.issuperset(key + value) for key, value in items):
+        return "&".join([f"{key}={value}" for key, value in items])
+    return urllib.parse.urlencode(data)
+
+
+class _SharedAdapter(HTTPAdapter):
+    """HTTP adapter shared by all sessions.
+
+    Closing a session must not close the connections of the other clients.
+    """
+
+    def close(self):
+        pass
+
+
+# once retries are exhausted, the last response is returned to read the error
+_RETRY = Retry(
+    total=3,
+    read=3,
+    connect=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=False,  # noqa
+    raise_on_status=False,
+)
+_ADAPTER = _SharedAdapter(max_retries=_RETRY, pool_connections=4, pool_maxsize=32)
+
+
+class RateLimiter:
+    """Token bucket limiting the rate of private queries.
+
+    It follows Kraken's call counter: each query increases the counter by
+    its cost and the counter decreases with time. A query that would bring
+    the counter above its maximum waits until the counter is low enough.
+    Default values correspond to the Starter verification tier.
+
+    Parameters
+    ----------
+    max_counter : float
+        Maximum value of the counter.
+    decay : float
+        Decrease of the counter per second.
+
+    """
+
+    def __init__(self, max_counter: float = 15, decay: float = 0.33):
+        self.max_counter = max_counter
+        self.decay = decay
+
+        self._counter = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float = 1) -> None:
+        """Wait until a query can be made and account for it.
+
+        Parameters
+        ----------
+        cost : float
+            Increase of the counter.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._counter = max(0, self._counter - (now - self._last) * self.decay)
+            self._last = now
+
+            wait = (self._counter + cost - self.max_counter) / self.decay
+            if wait > 0:
+                time.sleep(wait)
+                self._counter -= wait * self.decay
+                self._last += wait
+
+            self._counter += cost
 
 
 class Apophis:
@@ -83,6 +211,10 @@ class Apophis:
     You can change the attribute ``uri`` if you want to call the conformance
     environment of Kraken Future.
 
+    Private queries are not rate limited unless the attribute ``limiter`` is
+    set to a `RateLimiter`, which can be shared between clients using the
+    same API key.
+
     Parameters
     ----------
     key : str, optional
@@ -103,34 +235,43 @@ class Apophis:
         # API keys
         self.api_key = key
         self.api_secret = secret
+        self._api_secret_bytes = None if secret is None else base64.b64decode(secret)
 
         self.future = future
         if self.future:
-            self.uri = "https://futures.kraken.com/derivatives"
+            uri = "https://futures.kraken.com/derivatives"
             self.apiversion = "/api/v3/"
         else:
-            self.uri = "https://api.kraken.com"
+            uri = "https://api.kraken.com"
             self.apiversion = "/0/"
 
-        # Session
+        # API URL paths sans host, and their encoded form used for signing
+        self._endpoints = {}
+        for method in API_METHODS:
+            if self.future:
+                endpoint = self.apiversion + method
+            elif method in API_PUBLIC:
+                endpoint = self.apiversion + "public/" + method
+            else:
+                endpoint = self.apiversion + "private/" + method
+            self._endpoints[method] = endpoint
+        self._endpoints_bytes = {
+            endpoint: endpoint.encode() for endpoint in self._endpoints.values()
+        }
+        self.uri = uri
+
+        # Session, connections are pooled across clients
         self.session = requests.Session()
-        retry = Retry(
-            total=3,
-            read=3,
-            connect=3,
-            backoff_factor=0.3,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=False,  # noqa
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        self.session.mount("http://", _ADAPTER)
+        self.session.mount("https://", _ADAPTER)
 
         self.session.headers.update({"User-Agent": "Apophis/" + version})
 
         self.lock = threading.Lock()
+        self._nonce = 0
 
         self.timeout = 10
+        self.limiter = None
         self.response = None
         self._json_options = {}
 
@@ -140,21 +281,45 @@ class Apophis:
     def __exit__(self, *args):
         self.close()
 
+    @property
+    def uri(self) -> str:
+        """API host, full URLs are built when it is set."""
+        return self._uri
+
+    @uri.setter
+    def uri(self, uri: str):
+        self._uri = uri
+        self._urls = {endpoint: uri + endpoint for endpoint in self._endpoints.values()}
+
     def close(self):
-        """Close the session."""
+        """Close the session.
+
+        Connections are kept in the pool shared with other clients.
+        """
         self.session.close()
 
-    def _query(self, method: str, data: Dict, endpoint: str) -> Dict:
+    def _query(
+        self,
+        verb: str,
+        data: Dict,
+        endpoint: str,
+        private: bool = False,
+        cost: float = 1,
+    ) -> Dict:
         """Low-level query handling.
 
         Parameters
         ----------
-        method : str
-            Method.
+        verb : str
+            HTTP verb, ``GET`` or ``POST``.
         data : dict
             API request parameters.
         endpoint : str
             API URL path sans host.
+        private : bool
+            Sign the request.
+        cost : float
+            Increase of Kraken's call counter, for each attempt.
 
         Returns
         -------
@@ -162,16 +327,14 @@ class Apophis:
           Deserialized response.
 
         """
-        url = self.uri + endpoint
+        url = self._urls[endpoint]
 
-        if method in API_PRIVATE_GET or method in API_PUBLIC:
+        if verb == "GET":
             session_call = self.session.get
             params = {"params": data}
-        elif method in API_PRIVATE_POST:
+        else:
             session_call = self.session.post
             params = {"data": data}
-        else:
-            raise KeyError(f"Invalid method {method}")
 
         # Retry strategy: 4 times if API issue (ex. rate limit) with increasing
         # sleep to lower counter down. Last is 4 to be able to do a +2 ops.
@@ -179,33 +342,32 @@ class Apophis:
         sleeper = [0, 2, 4, 0]
         while api_call < 4:
 
-            self.lock.acquire()  # nonce call must be sequential
-            if method in API_PRIVATE_GET or method in API_PRIVATE_POST:
-                headers = self._sign_message(data, endpoint)
-                params["headers"] = headers
+            if private and self.limiter is not None:
+                self.limiter.acquire(cost)
 
-            with session_call(url, timeout=self.timeout, **params) as self.response:
+            if private:
+                # nonces must reach the server in order, so the lock is held
+                # until the response is received
+                with self.lock:
+                    params["headers"] = self._sign_message(data, endpoint)
+                    response = session_call(url, timeout=self.timeout, **params)
+            else:
+                response = session_call(url, timeout=self.timeout, **params)
 
-                self.lock.release()
+            with response:
+                self.response = response
+                resp, error = self._read(response)
 
-                # Look for errors
-                resp = self.response.json(**self._json_options)
-                if not self.future:
-                    error = resp["error"]
-                else:
-                    if resp["result"] == "success":
-                        error = []
-                    else:
-                        error = resp["error"]
-                if error:
-                    time.sleep(sleeper[api_call])
-                    api_call += 1
-                    continue
-
-                if self.response.status_code not in (200, 201, 202):
-                    self.response.raise_for_status()
-                else:
-                    break
+            if not error:
+                break
+
+            # statuses already retried by the adapter are not retried again
+            if response.status_code in _RETRY.status_forcelist:
+                api_call = len(sleeper)
+                continue
+
+            time.sleep(sleeper[api_call])
+            api_call += 1
         else:
             raise ConnectionError(
                 f"{error}\n" f"-> URL: {url}\n-> Params: {params}\n"  # noqa
@@ -213,6 +375,49 @@ class Apophis:
 
         return resp
 
+    def _read(self, response: requests.Response) -> Tuple[Optional[Dict], List]:
+        """Deserialize a response and look for errors.
+
+        The body of an HTTP error is read as well since it usually carries
+        Kraken's error. Otherwise the HTTP status is reported as the error.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Response of the API.
+
+        Returns
+        -------
+        response : dict or None
+            Deserialized response, None if an HTTP error has no JSON body.
+        error : list
+            Errors, empty if the query succeeded.
+
+        """
+        http_error = response.status_code not in (200, 201, 202)
+        try:
+            if orjson is not None and not self._json_options:
+                resp = orjson.loads(response.content)
+            else:
+                resp = response.json(**self._json_options)
+
+            if not self.future:
+                error = resp["error"]
+            else:
+                if resp["result"] == "success":
+                    error = []
+                else:
+                    error = resp["error"]
+        except (ValueError, KeyError, TypeError):
+            if not http_error:
+                raise
+            resp, error = None, []
+
+        if http_error and not error:
+            error = [f"HTTP {response.status_code} {response.reason}"]
+
+        return resp, error
+
     def query(self, method: str, data: Optional[Dict] = None):
         """Performs an API query that requires a valid key/secret pair.
 
@@ -229,29 +434,66 @@ class Apophis:
             Deserialized response.
 
         """
-        if method not in API_METHODS:
+        try:
+            verb, private = _METHOD_TABLE[method]
+        except KeyError:
             raise ValueError(
                 f"Method {method} does not exists. Can only be "
-                f"one of: {API_METHODS}"
-            )
+                f"one of: {', '.join(sorted(API_METHODS))}"
+            ) from None
 
         if data is None:
             data = {}
 
-        endpoint = self.apiversion + method
+        if private:
+            self.check_keys()
 
-        # create authentication headers
-        if method in API_PRIVATE_GET or method in API_PRIVATE_POST:
-            if self.api_key is None or self.api_secret is None:
-                raise ConnectionError("Need API keys to connect")
+        return self._query(
+            verb,
+            data,
+            self._endpoints[method],
+            private=private,
+            cost=_METHOD_COST.get(method, 1),
+        )
 
-            if not self.future:
-                endpoint = self.apiversion + "private/" + method
-        else:
-            if not self.future:
-                endpoint = self.apiversion + "public/" + method
+    def check_keys(self) -> None:
+        """Check that private queries can be signed.
+
+        Raises
+        ------
+        ConnectionError
+            If the key/secret pair is missing.
 
-        return self._query(method, data, endpoint)
+        """
+        if self.api_key is None or self.api_secret is None:
+            raise ConnectionError("Need API keys to connect")
+
+    def query_many(
+        self, queries: List[Tuple[str, Optional[Dict]]], max_workers: int = 8
+    ) -> List[Dict]:
+        """Performs several API queries concurrently.
+
+        Public queries overlap on the network. Private queries are still sent
+        one after the other as nonces must reach the server in order.
+
+        Parameters
+        ----------
+        queries : list(tuple(str, dict))
+            Method and API request parameters of each query.
+        max_workers : int
+            Maximum number of queries in flight.
+
+        Returns
+        -------
+        responses : list(dict)
+            Deserialized responses in the order of `queries`.
+
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.query, method, data) for method, data in queries
+            ]
+            return [future.result() for future in futures]
 
     def _sign_message(self, data: Dict, endpoint: str) -> Dict[str, str]:
         """Sign request data according to Kraken's scheme.
@@ -269,22 +511,25 @@ class Apophis:
             Signed headers.
 
         """
-        nonce = str(int(1000 * time.time()))
+        # strictly increasing, even for queries within the same millisecond
+        self._nonce = max(int(1000 * time.time()), self._nonce + 1)
+        nonce = str(self._nonce)
         if not self.future:
             data["nonce"] = nonce
 
-        data = urllib.parse.urlencode(data)
+        data = _urlencode(data).encode()
         # Cryptographic hash algorithms
         if not self.future:
-            message = (nonce + data).encode()
-            sha256_hash = endpoint.encode() + hashlib.sha256(message).digest()
+            message = b"".join((nonce.encode(), data))
+            sha256_hash = b"".join(
+                (self._endpoints_bytes[endpoint], hashlib.sha256(message).digest())
+            )
         else:
-            message = (data + nonce + endpoint).encode()
+            message = b"".join((data, nonce.encode(), self._endpoints_bytes[endpoint]))
             sha256_hash = hashlib.sha256(message).digest()
 
         # Signing with API secret
-        api_secret = base64.b64decode(self.api_secret)
-        signature = hmac.new(api_secret, sha256_hash, hashlib.sha512).digest()
+        signature = hmac.digest(self._api_secret_bytes, sha256_hash, "sha512")
         signature = base64.b64encode(signature).decode()
 
         if not self.future:
@@ -1,3 +1,6 @@
+import logging
+import sys
+
 from typing import Union
 
 import typer
@@ -7,45 +10,43 @@ from apophis.configuration import Credentials
 
 
 app = typer.Typer()
-exchange: Union[Kraken, KrakenFuture]
 api_credentials = Credentials()
 
 
-def close_exchange(*args, **kwargs):
-    """Cleaning up."""
-    exchange.close()
-
-
-@app.callback(result_callback=close_exchange)
+@app.callback()
 def open_exchange(
+    ctx: typer.Context,
     key: str = api_credentials.key,
     secret: str = api_credentials.secret,
     future: bool = api_credentials.future,
 ) -> None:
     """Apophis."""
-    global api_credentials, exchange
-    api_credentials = Credentials(**locals())
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
 
-    if api_credentials.future:
+    credentials = Credentials(key=key, secret=secret, future=future)
+
+    if credentials.future:
         exchange_ = KrakenFuture
     else:
         exchange_ = Kraken
 
-    api_credentials = api_credentials.dict()
-    del api_credentials["future"]
-
-    exchange = exchange_(**api_credentials)
+    exchange = exchange_(**credentials.dict(exclude={"future"}))
+    ctx.obj = exchange
+    ctx.call_on_close(exchange.close)
 
 
 @app.command(
     context_settings={"allow_extra_args": True, "ignore_unknown_options": True}
 )
-def query(data: typer.Context, method: str) -> None:
+def query(ctx: typer.Context, method: str) -> None:
     """Apophis calls the Kraken."""
-    data = dict([item.strip("--").split("=") for item in data.args])
+    data = {}
+    for item in ctx.args:
+        key, _, value = item.lstrip("-").partition("=")
+        data[key] = value
 
     try:
-        response = exchange.api.query(method=method, data=data)
+        response = ctx.obj.api.query(method=method, data=data)
     except ConnectionError as conn_err:
         typer.echo(f"Connection issue:\n{conn_err}")
         raise typer.Exit(code=1)
@@ -56,7 +57,13 @@ def query(data: typer.Context, method: str) -> None:
         typer.echo(f"{response}")
 
 
-def _order(pair: str, volume: float, price: float = None, side: str = "buy") -> None:
+def _order(
+    exchange: Union[Kraken, KrakenFuture],
+    pair: str,
+    volume: float,
+    price: float = None,
+    side: str = "buy",
+) -> None:
     if price is None:
         price = exchange.market_price(pair)
 
@@ -64,20 +71,20 @@ def _order(pair: str, volume: float, price: float = None, side: str = "buy") ->
 
 
 @app.command()
-def buy(pair: str, volume: float, price: float = None) -> None:
+def buy(ctx: typer.Context, pair: str, volume: float, price: float = None) -> None:
     """Limit buy order."""
-    _order(pair=pair, volume=volume, price=price, side="buy")
+    _order(ctx.obj, pair=pair, volume=volume, price=price, side="buy")
 
 
 @app.command()
-def sell(pair: str, volume: float, price: float = None) -> None:
+def sell(ctx: typer.Context, pair: str, volume: float, price: float = None) -> None:
     """Limit sell order."""
-    _order(pair=pair, volume=volume, price=price, side="sell")
+    _order(ctx.obj, pair=pair, volume=volume, price=price, side="sell")
 
 
 @app.command()
-def price(pair: str):
+def price(ctx: typer.Context, pair: str):
     """Current market price."""
-    price = exchange.market_price(pair)
+    price = ctx.obj.market_price(pair)
 
     typer.echo(f"{pair}: {price}")
@@ -1,17 +1,45 @@
 import datetime
+import decimal
+import logging
 import random
+import threading
 import time
 
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from dateutil import parser
-
 from .apophis import Apophis
 
 
+logger = logging.getLogger(__name__)
+
+
+class OrderError(Exception):
+    """Some of the concurrent orders raised an error.
+
+    Orders which raised may have been placed, their status is unknown.
+
+    Parameters
+    ----------
+    processed : list(bool or Exception)
+        For each order, True if the transaction succeeded, False if the
+        order was not placed, or the raised error.
+
+    """
+
+    def __init__(self, processed: List):
+        self.processed = processed
+        n_errors = sum(isinstance(order, Exception) for order in processed)
+        super().__init__(
+            f"{n_errors} out of {len(processed)} orders raised an error, "
+            "they may have been placed"
+        )
+
+
 class Exchange(ABC):
     """A generic Exchange class meant for subclassing.
 
@@ -35,6 +63,10 @@ class Exchange(ABC):
     the total fee incurred by the buys and sells of the session ; ``n_buy``
     for the number of buys ; and ``n_sell`` for the number of sells.
 
+    When not live, orders are processed instantly. Setting the attribute
+    ``simulate_latency`` to a duration in seconds makes each order take
+    between one and two times this duration.
+
     **Subclassing**
 
     When subclassing `Exchange` to create a new exchange,  ``__init__``m
@@ -47,7 +79,8 @@ class Exchange(ABC):
     * ``_fee()``: Returns maker and taker fees.
     * ``_order(pair, coins, price, side)``: Place an order with ``side`` one of
       ``sell``, ``buy``.
-    * ``_trades(pair, since, until)``: List of price history in a time frame.
+    * ``_trades(pair, since, until)``: Arrays of times (Unix time in second) and
+      prices of the trades in a time frame.
 
     Optionally, 3 other methods can be overwritten by subclasses:
 
@@ -55,6 +88,8 @@ class Exchange(ABC):
     * ``sell``: Sell logic. Calls the underlying ``_order``.
     * ``ohlc``: OHLC data. Falls back to ``ohlc_history``.
 
+    ``buy_many`` and ``sell_many`` call ``buy`` and ``sell`` concurrently.
+
     """
 
     @abstractmethod
@@ -72,6 +107,10 @@ class Exchange(ABC):
         self.fee = 0
         self.n_buy = 0
         self.n_sell = 0
+        self.simulate_latency = 0
+        self._counters_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._polled: Dict[str, Tuple[float, Dict]] = {}
 
     def __enter__(self):
         return self
@@ -81,7 +120,7 @@ class Exchange(ABC):
 
     def close(self):
         """Close the session."""
-        self.api.session.close()
+        self.api.close()
 
     def time(self) -> float:
         """Unix server time in second."""
@@ -143,6 +182,54 @@ class Exchange(ABC):
 
         """
 
+    def _poll(
+        self,
+        method: str,
+        done: Callable[[Dict], bool],
+        wait: float = 0.25,
+        max_wait: float = 5,
+    ) -> Dict:
+        """Query the API until a condition is met.
+
+        The wait between queries doubles, with some jitter, up to
+        `max_wait`. Orders filling quickly are seen early without hammering
+        the API for the slow ones.
+
+        Concurrent polls of a method share the responses: a response received
+        while a poll was waiting is used instead of querying again. A single
+        query follows up all the orders in flight.
+
+        Parameters
+        ----------
+        method : str
+            Method to query.
+        done : callable
+            ``done(response) -> bool``, polling stops when it returns True.
+        wait : float
+            First wait in seconds.
+        max_wait : float
+            Maximum wait in seconds.
+
+        Returns
+        -------
+        response : dict
+            Deserialized response for which `done` is True.
+
+        """
+        while True:
+            since = time.monotonic()
+            time.sleep(wait * (0.9 + random.random() * 0.2))
+            with self._poll_lock:
+                received, response = self._polled.get(method, (since, None))
+                if received <= since:
+                    response = self.api.query(method)
+                    self._polled[method] = (time.monotonic(), response)
+
+            if done(response):
+                return response
+            logger.info("Order not completed yet!")
+            wait = min(2 * wait, max_wait)
+
     def buy(self, pair: str, volume: float, price: float) -> bool:
         """Buy order.
 
@@ -161,19 +248,28 @@ class Exchange(ABC):
             True if the transaction succeeded.
 
         """
-        print(f"Buying {volume} {pair} at {price} -> {volume * price} {pair[-3:]}")
+        logger.info(
+            "Buying %s %s at %s -> %s %s",
+            volume,
+            pair,
+            price,
+            volume * price,
+            pair[-3:],
+        )
         if self.live:
             processed, fee = self._order(
                 pair=pair, volume=volume, price=price, side="buy"
             )
         else:
             fee = volume * price * self.fee_taker
-            time.sleep(1 + random.random() * 1)
+            if self.simulate_latency:
+                time.sleep(self.simulate_latency * (1 + random.random()))
             processed = True
 
         if processed:
-            self.fee += fee
-            self.n_buy += 1
+            with self._counters_lock:
+                self.fee += fee
+                self.n_buy += 1
 
         return processed
 
@@ -195,26 +291,119 @@ class Exchange(ABC):
             True if the transaction succeeded.
 
         """
-        print(f"Selling {volume} {pair} at {price} -> {volume * price} {pair[-3:]}")
+        logger.info(
+            "Selling %s %s at %s -> %s %s",
+            volume,
+            pair,
+            price,
+            volume * price,
+            pair[-3:],
+        )
         if self.live:
             processed, fee = self._order(
                 pair=pair, volume=volume, price=price, side="sell"
             )
         else:
             fee = volume * price * self.fee_maker
-            time.sleep(1 + random.random() * 1)
+            if self.simulate_latency:
+                time.sleep(self.simulate_latency * (1 + random.random()))
             processed = True
 
         if processed:
-            self.fee += fee
-            self.n_sell += 1
+            with self._counters_lock:
+                self.fee += fee
+                self.n_sell += 1
+
+        return processed
+
+    def _many(
+        self, order: Callable, orders: List[Tuple[str, float, float]], max_workers: int
+    ) -> List[bool]:
+        """Call `order` concurrently on each pair, volume and price."""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(order, pair, volume, price)
+                for pair, volume, price in orders
+            ]
+
+        processed = [
+            future.result() if future.exception() is None else future.exception()
+            for future in futures
+        ]
+        errors = [order for order in processed if isinstance(order, Exception)]
+        if errors:
+            raise OrderError(processed) from errors[0]
 
         return processed
 
+    def buy_many(
+        self, orders: List[Tuple[str, float, float]], max_workers: int = 8
+    ) -> List[bool]:
+        """Buy orders placed concurrently.
+
+        Orders are followed up together instead of waiting for each one to
+        complete before placing the next. The orders in flight share their
+        status queries. If private queries still exceed Kraken's limits, set
+        ``api.limiter`` to a `RateLimiter`, it is off by default.
+
+        Parameters
+        ----------
+        orders : list(tuple(str, float, float))
+            Pair, number of coins to buy and limit price of each order.
+        max_workers : int
+            Maximum number of orders in flight.
+
+        Returns
+        -------
+        processed : list(bool)
+            True if the transaction succeeded, False if the order was not
+            placed, in the order of `orders`.
+
+        Raises
+        ------
+        OrderError
+            If any order raised an error. The other orders are still
+            completed and accounted for.
+
+        """
+        return self._many(self.buy, orders, max_workers=max_workers)
+
+    def sell_many(
+        self, orders: List[Tuple[str, float, float]], max_workers: int = 8
+    ) -> List[bool]:
+        """Sell orders placed concurrently.
+
+        Orders are followed up together instead of waiting for each one to
+        complete before placing the next. The orders in flight share their
+        status queries. If private queries still exceed Kraken's limits, set
+        ``api.limiter`` to a `RateLimiter`, it is off by default.
+
+        Parameters
+        ----------
+        orders : list(tuple(str, float, float))
+            Pair, number of coins to sell and limit price of each order.
+        max_workers : int
+            Maximum number of orders in flight.
+
+        Returns
+        -------
+        processed : list(bool)
+            True if the transaction succeeded, False if the order was not
+            placed, in the order of `orders`.
+
+        Raises
+        ------
+        OrderError
+            If any order raised an error. The other orders are still
+            completed and accounted for.
+
+        """
+        return self._many(self.sell, orders, max_workers=max_workers)
+
     @abstractmethod
     def _trades(
         self, pair: str, since: float, until: float
-    ) -> List[Tuple[float, float]]:
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """Trades price history.
 
         Parameters
@@ -228,8 +417,8 @@ class Exchange(ABC):
 
         Returns
         -------
-        trades : dataframe
-            Trades data.
+        times, prices : array_like (n,)
+            Unix time in second and price of each trade.
 
         """
 
@@ -263,15 +452,10 @@ class Exchange(ABC):
         if since is None:
             since = until - 3600 * 12
 
-        data = self._trades(pair=pair, since=since, until=until)
-
-        ohlc = pd.DataFrame(data, columns=["time", "price"])
-        ohlc["date"] = pd.to_datetime(ohlc.time, unit="s")
-        ohlc.sort_values("date", ascending=True, inplace=True)
-        ohlc.set_index("date", inplace=True)
-        ohlc = ohlc.drop(columns=["time"])
+        times, prices = self._trades(pair=pair, since=since, until=until)
 
-        ohlc = ohlc.price
+        date = pd.to_datetime(times, unit="s").rename("date")
+        ohlc = pd.Series(prices, index=date, name="price").sort_index()
 
         return ohlc.resample(f"{interval}T").ohlc().ffill()
 
@@ -300,7 +484,19 @@ class Exchange(ABC):
 
 
 class Kraken(Exchange):
-    """Exchange for Kraken."""
+    """Exchange for Kraken.
+
+    Fees are shared between instances using the same API key and fetched
+    again after ``fees_ttl`` seconds.
+
+    Orders are formatted with the number of decimals accepted for the
+    price and the volume of the pair, fetched once and shared between
+    instances.
+    """
+
+    fees_ttl = 3600
+    _fees_cache: Dict[Optional[str], Tuple[float, Tuple[float, float]]] = {}
+    _decimals_cache: Dict[str, Tuple[int, int]] = {}
 
     def __init__(self, key: str = None, secret: str = None, live: bool = False):
         super().__init__(key=key, secret=secret, live=live, future=False)
@@ -342,66 +538,90 @@ class Kraken(Exchange):
         return asks, bids
 
     def _fees(self) -> Tuple[float, float]:
+        key = self.api.api_key
+        cached = self._fees_cache.get(key)
+        if cached is not None and time.time() - cached[0] < self.fees_ttl:
+            return cached[1]
+
         try:
             fee_info = self.api.query("TradeVolume", {"pair": "XXRPZEUR"})
             fee_maker = float(fee_info["result"]["fees_maker"]["XXRPZEUR"]["fee"])
             fee_taker = float(fee_info["result"]["fees"]["XXRPZEUR"]["fee"])
         except ConnectionError:
-            fee_maker = 0.16
-            fee_taker = 0.26
+            # default fees are not cached to try again with the next instance
+            return 0.16 / 100, 0.26 / 100
+
+        fees = fee_maker / 100, fee_taker / 100
+        self._fees_cache[key] = (time.time(), fees)
+        return fees
+
+    def _decimals(self, pair: str) -> Tuple[int, int]:
+        """Decimals accepted for the price and the volume of a pair."""
+        decimals = self._decimals_cache.get(pair)
+        if decimals is None:
+            response = self.api.query("AssetPairs", {"pair": pair})
+            # only one pair, keyed by its name which can differ from `pair`
+            (info,) = response["result"].values()
+            decimals = info["pair_decimals"], info["lot_decimals"]
+            self._decimals_cache[pair] = decimals
 
-        fee_maker /= 100
-        fee_taker /= 100
-        return fee_maker, fee_taker
+        return decimals
 
     def _order(self, pair: str, volume: float, price: float, side: str):
+        # missing keys are reported before querying the pair
+        self.api.check_keys()
+
+        price_decimals, volume_decimals = self._decimals(pair)
+        # rounding the volume up could exceed the balance
+        volume = decimal.Decimal(str(volume)).quantize(
+            decimal.Decimal(1).scaleb(-volume_decimals), rounding=decimal.ROUND_DOWN
+        )
         payload = {
             "pair": pair,
             "type": side,
             "ordertype": "limit",
-            "price": f"{price:.10f}",
-            "volume": f"{volume:.20f}",
+            "price": f"{price:.{price_decimals}f}",
+            "volume": f"{volume:f}",
             # "validate": True
         }
         response = self.api.query("AddOrder", payload)
 
         if "txid" not in response["result"]:
-            print(f"Cannot place order! -> {response}")
+            logger.warning("Cannot place order! -> %s", response)
             return False, None
         else:
             txid = response["result"]["txid"][0]
 
-            time.sleep(5)
-            response = self.api.query("ClosedOrders")
-
-            while txid not in response["result"]["closed"]:
-                print("Order not completed yet!")
-                time.sleep(5)
-                response = self.api.query("ClosedOrders")
+            response = self._poll(
+                "ClosedOrders", lambda response: txid in response["result"]["closed"]
+            )
 
-            if type == "buy":
-                fee = float(response["result"]["closed"][txid]["fee"])
-            else:
-                fee = float(response["result"]["closed"][txid]["fee"])
+            fee = float(response["result"]["closed"][txid]["fee"])
 
             return True, fee
 
     def _trades(
         self, pair: str, since: float, until: float
-    ) -> List[Tuple[float, float]]:
+    ) -> Tuple[np.ndarray, np.ndarray]:
 
         until *= 1e9
         since = int(since * 1e9)
-        data = []
+        times, prices = [np.empty(0)], [np.empty(0)]
         while float(since) < until:
             response = self.api.query("Trades", {"pair": pair, "since": since})
             since = response["result"]["last"]
             trades = response["result"][pair]
-            data.extend([(trade[2], float(trade[0])) for trade in trades])
-            if len(trades) <= 1:
+            n_trades = len(trades)
+            times.append(
+                np.fromiter((trade[2] for trade in trades), np.float64, n_trades)
+            )
+            prices.append(
+                np.fromiter((trade[0] for trade in trades), np.float64, n_trades)
+            )
+            if n_trades <= 1:
                 break
 
-        return data
+        return np.concatenate(times), np.concatenate(prices)
 
     def ohlc(self, pair: str, interval: int = 1, since=None) -> pd.DataFrame:
         """OHLC data for a given pair.
@@ -428,53 +648,53 @@ class Kraken(Exchange):
         payload = {"pair": pair, "interval": interval, "since": since}
         res = self.api.query("OHLC", data=payload)
 
-        # create dataframe
-        ohlc = pd.DataFrame(res["result"][pair])
-
-        # set time, column names
-        ohlc.columns = [
-            "time",
-            "open",
-            "high",
-            "low",
-            "close",
-            "vwap",
-            "volume",
-            "count",
-        ]
-        ohlc["date"] = pd.to_datetime(ohlc.time, unit="s")
-        ohlc.sort_values("date", ascending=True, inplace=True)
-        ohlc.set_index("date", inplace=True)
-
-        ohlc = ohlc.drop(columns=["time", "vwap", "volume", "count"])
+        # rows are: time, open, high, low, close, vwap, volume, count
+        rows = res["result"][pair]
+        times = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+        prices = np.array([row[1:5] for row in rows], dtype=np.float64)
 
-        # dtypes
-        for col in ["open", "high", "low", "close"]:
-            ohlc.loc[:, col] = ohlc[col].astype(float)
+        order = np.argsort(times, kind="stable")
+        date = pd.to_datetime(times[order], unit="s").rename("date")
 
-        return ohlc
+        return pd.DataFrame(
+            prices.reshape(-1, 4)[order],
+            index=date,
+            columns=["open", "high", "low", "close"],
+        )
 
 
 class KrakenFuture(Exchange):
-    """Exchange for Kraken Future."""
+    """Exchange for Kraken Future.
+
+    Fees do not depend on the account and are not queried.
+
+    Market prices come from the tickers of all symbols, which are kept
+    for ``tickers_ttl`` seconds to serve consecutive calls.
+    """
+
+    fee_maker = 0.02 / 100
+    fee_taker = 0.05 / 100
+    tickers_ttl = 0.5
 
     def __init__(self, key: str = None, secret: str = None, live: bool = False):
         super().__init__(key=key, secret=secret, live=live, future=True)
+        self._tickers: Tuple[float, Dict[str, Dict]] = (0, {})
 
     def time(self) -> float:
         iso_time = self.api.query("instruments")["serverTime"]
-        return parser.parse(iso_time).timestamp()
+        return pd.Timestamp(iso_time).timestamp()
 
     def market_price(self, pair: str) -> float:
-        ticks = self.api.query("tickers")
-        last = [tick["last"] for tick in ticks["tickers"] if tick["symbol"] == pair][0]
-        return last
+        fetched, tickers = self._tickers
+        if time.time() - fetched >= self.tickers_ttl:
+            ticks = self.api.query("tickers")
+            tickers = {tick["symbol"]: tick for tick in ticks["tickers"]}
+            self._tickers = (time.time(), tickers)
 
-    def _fees(self) -> Tuple[float, float]:
-        fee_maker = 0.02 / 100
-        fee_taker = 0.05 / 100
+        return tickers[pair]["last"]
 
-        return fee_maker, fee_taker
+    def _fees(self) -> Tuple[float, float]:
+        return self.fee_maker, self.fee_taker
 
     def _order(self, pair: str, volume: float, price: float, side: str):
         payload = {
@@ -489,28 +709,19 @@ class KrakenFuture(Exchange):
         status = response["sendStatus"]["status"]
 
         if status != "placed":
-            print(f"Cannot place order! -> {status}")
+            logger.warning("Cannot place order! -> %s", status)
             return False, None
         else:
             txid = response["sendStatus"]["order_id"]
 
-            time.sleep(5)
-            response = self.api.query("fills")
-            not_done = not any(
-                [event["order_id"] == txid for event in response["fills"]]
-            )
+            def filled(response):
+                return txid in {event["order_id"] for event in response["fills"]}
 
-            while not_done:
-                print("Order not completed yet!")
-                time.sleep(5)
-                response = self.api.query("fills")
-                not_done = not any(
-                    [event["order_id"] == txid for event in response["fills"]]
-                )
+            self._poll("fills", filled)
 
-            print("Order completed!")
+            logger.info("Order completed!")
 
-            if type == "buy":
+            if side == "buy":
                 fee = volume * price * self.fee_taker
             else:
                 fee = volume * price * self.fee_maker
@@ -519,19 +730,28 @@ class KrakenFuture(Exchange):
 
     def _trades(
         self, pair: str, since: float, until: float
-    ) -> List[Tuple[float, float]]:
-        data = []
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        times, prices = [np.empty(0)], [np.empty(0)]
         while since < until:
-            until = datetime.datetime.fromtimestamp(until)
-            until = until.isoformat() + "Z"
-            response = self.api.query("history", {"symbol": pair, "lastTime": until})
+            last_time = datetime.datetime.fromtimestamp(until, datetime.timezone.utc)
+            last_time = last_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            response = self.api.query(
+                "history", {"symbol": pair, "lastTime": last_time}
+            )
             trades = response["history"]
-            trades = [
-                (parser.parse(trade["time"]).timestamp(), trade["price"])
-                for trade in trades
-            ]
-            until = trades[0][0]
+            if not trades:
+                break
 
-            data.extend(trades)
+            date = pd.to_datetime([trade["time"] for trade in trades], utc=True)
+            times.append(date.asi8 / 1e9)
+            prices.append(
+                np.array([trade["price"] for trade in trades], dtype=np.float64)
+            )
+
+            # next page ends with the oldest trade received
+            oldest = times[-1].min()
+            if oldest >= until:
+                break
+            until = oldest
 
-        return data
+        return np.concatenate(times), np.concatenate(prices)
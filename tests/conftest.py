@@ -0,0 +1,39 @@
+import pytest
+
+from apophis import Kraken, KrakenFuture
+
+
+@pytest.fixture(scope="session")
+def kraken():
+    """Read-only Kraken exchange shared by the tests."""
+    with Kraken() as exchange:
+        yield exchange
+
+
+@pytest.fixture(scope="session")
+def kraken_future():
+    """Read-only Kraken Future exchange shared by the tests."""
+    with KrakenFuture() as exchange:
+        yield exchange
+
+
+@pytest.fixture
+def kraken_future_live(monkeypatch):
+    """Live Kraken Future exchange whose orders are filled at once.
+
+    Orders on the symbol ``pi_unknown`` are rejected.
+    """
+    monkeypatch.setattr("apophis.exchange.time.sleep", lambda _: None)
+    responses = {
+        "sendorder": {"sendStatus": {"status": "placed", "order_id": "42"}},
+        "fills": {"fills": [{"order_id": "42"}]},
+    }
+
+    def query(method, data=None):
+        if data is not None and data.get("symbol") == "pi_unknown":
+            raise ConnectionError("invalidArgument: symbol")
+        return responses[method]
+
+    with KrakenFuture(live=True) as exchange:
+        monkeypatch.setattr(exchange.api, "query", query)
+        yield exchange
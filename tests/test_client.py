@@ -1,12 +1,16 @@
+import base64
+import io
+
 import pytest
+import requests
 
-from apophis import Apophis
+from apophis import Apophis, RateLimiter
 
 
 def test_client():
     with Apophis() as client:
         # unknown method
-        with pytest.raises(ValueError):
+        with pytest.raises(ValueError, match="one of: AddExport, AddOrder, "):
             client.query(method="toto")
 
         # trying to access private method
@@ -28,3 +32,82 @@ def test_response():
         assert isinstance(response, dict)
         print(response["result"])
         assert 0 < float(response["result"]["XXRPZEUR"]["c"][0]) < 100
+
+
+def test_query_many():
+    with Apophis() as client:
+        responses = client.query_many(
+            [("Ticker", {"pair": "XXRPZEUR"}), ("Depth", {"pair": "XXRPZEUR"})]
+        )
+
+        assert len(responses) == 2
+        assert "XXRPZEUR" in responses[0]["result"]
+        assert "asks" in responses[1]["result"]["XXRPZEUR"]
+
+
+def test_rate_limiter(monkeypatch):
+    waits = []
+    monkeypatch.setattr("apophis.apophis.time.sleep", waits.append)
+
+    limiter = RateLimiter(max_counter=2, decay=1)
+    limiter.acquire()
+    limiter.acquire()
+    # placing orders does not increase the counter
+    limiter.acquire(0)
+    assert waits == []
+
+    limiter.acquire()
+    assert waits == [pytest.approx(1, abs=0.1)]
+
+
+def stub_response(status_code, content):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.raw = io.BytesIO()
+    return response
+
+
+@pytest.mark.parametrize(
+    "status_code, content, message, n_calls",
+    [
+        (404, b'{"error":["EGeneral:Unknown method"]}', "EGeneral:Unknown method", 4),
+        (404, b"<html>Not Found</html>", "HTTP 404", 4),
+        # already retried by the adapter
+        (503, b"<html>Unavailable</html>", "HTTP 503", 1),
+    ],
+)
+def test_http_error(monkeypatch, status_code, content, message, n_calls):
+    monkeypatch.setattr("apophis.apophis.time.sleep", lambda _: None)
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return stub_response(status_code, content)
+
+    with Apophis() as client:
+        monkeypatch.setattr(client.session, "get", get)
+
+        with pytest.raises(ConnectionError, match=message):
+            client.query("Ticker", {"pair": "XXRPZEUR"})
+
+    assert len(calls) == n_calls
+
+
+def test_rate_limiter_retries(monkeypatch):
+    monkeypatch.setattr("apophis.apophis.time.sleep", lambda _: None)
+    costs = []
+
+    def post(url, **kwargs):
+        return stub_response(200, b'{"error":["EAPI:Rate limit exceeded"]}')
+
+    with Apophis(key="key", secret=base64.b64encode(b"secret").decode()) as client:
+        client.limiter = RateLimiter()
+        monkeypatch.setattr(client.limiter, "acquire", costs.append)
+        monkeypatch.setattr(client.session, "post", post)
+
+        with pytest.raises(ConnectionError, match="Rate limit exceeded"):
+            client.query("Ledgers")
+
+    # every attempt is charged
+    assert costs == [2] * 4
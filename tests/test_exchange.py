@@ -1,7 +1,11 @@
+import threading
+import time
+
+import numpy as np
 import pandas as pd
 import pytest
 
-from apophis import Kraken, KrakenFuture
+from apophis import Kraken, KrakenFuture, OrderError
 
 
 def test_exchange():
@@ -34,28 +38,26 @@ def test_exchange():
         assert exchange.fee == sell_fee + buy_fee
 
 
-def test_book():
-    with Kraken() as exchange:
-        asks, bids = exchange.book("XXRPZEUR")
+def test_book(kraken):
+    asks, bids = kraken.book("XXRPZEUR")
 
-        assert len(asks) == len(bids) == 1
-        assert asks[0] >= bids[0]
+    assert len(asks) == len(bids) == 1
+    assert asks[0] >= bids[0]
 
-        asks, bids = exchange.book("XXRPZEUR", 2)
+    asks, bids = kraken.book("XXRPZEUR", 2)
 
-        assert len(asks) == len(bids) == 2
+    assert len(asks) == len(bids) == 2
 
-        assert asks[1] >= asks[0]
-        assert bids[0] >= bids[1]
+    assert asks[1] >= asks[0]
+    assert bids[0] >= bids[1]
 
-        assert asks[0] >= bids[0]
-        assert asks[0] >= bids[1]
+    assert asks[0] >= bids[0]
+    assert asks[0] >= bids[1]
 
 
-def test_ohlc():
-    with Kraken() as exchange:
-        ohlc = exchange.ohlc("XXRPZEUR")
-        ohlc_historical = exchange.ohlc_from_trades("XXRPZEUR")
+def test_ohlc(kraken):
+    ohlc = kraken.ohlc("XXRPZEUR")
+    ohlc_historical = kraken.ohlc_from_trades("XXRPZEUR")
 
     assert len(ohlc) == 720
     assert 710 <= len(ohlc_historical) <= 730
@@ -64,9 +66,8 @@ def test_ohlc():
     assert len(df_diff) / 720 < 0.05
 
 
-def test_ohlc_future():
-    with KrakenFuture() as exchange_f:
-        exchange_f.ohlc("pi_xrpusd", since=exchange_f.time() - 300)
+def test_ohlc_future(kraken_future):
+    kraken_future.ohlc("pi_xrpusd", since=kraken_future.time() - 300)
 
 
 def test_live():
@@ -80,7 +81,138 @@ def test_live():
             exchange.sell("XXRPZEUR", 1000, 0.5)
 
 
-def test_future_exchange():
+def test_future_exchange(kraken_future):
+    price = kraken_future.market_price("pi_xrpusd")
+    assert 0 < price < 100
+
+
+def test_order_fee(kraken_future_live):
+    kraken_future_live.buy("pi_xrpusd", 1000, 0.5)
+    assert kraken_future_live.fee == 1000 * 0.5 * kraken_future_live.fee_taker
+
+    kraken_future_live.fee = 0
+    kraken_future_live.sell("pi_xrpusd", 1000, 0.5)
+    assert kraken_future_live.fee == 1000 * 0.5 * kraken_future_live.fee_maker
+
+
+def test_order_many(kraken_future_live):
+    orders = kraken_future_live.buy_many([("pi_xrpusd", 1000, 0.5)] * 10)
+    assert orders == [True] * 10
+    assert kraken_future_live.n_buy == 10
+    fee = 10 * 1000 * 0.5 * kraken_future_live.fee_taker
+    assert kraken_future_live.fee == pytest.approx(fee)
+
+    orders = kraken_future_live.sell_many([("pi_xrpusd", 1000, 0.5)] * 5)
+    assert orders == [True] * 5
+    assert kraken_future_live.n_sell == 5
+
+    # a failing order does not hide the others
+    with pytest.raises(OrderError) as err:
+        kraken_future_live.sell_many(
+            [
+                ("pi_xrpusd", 1000, 0.5),
+                ("pi_unknown", 1000, 0.5),
+                ("pi_xrpusd", 1000, 0.5),
+            ]
+        )
+    processed = err.value.processed
+    assert processed[0] is True and processed[2] is True
+    assert isinstance(processed[1], ConnectionError)
+    assert kraken_future_live.n_sell == 7
+
+
+def test_order_many_poll(monkeypatch):
+    sleep = time.sleep
+    monkeypatch.setattr("apophis.exchange.time.sleep", lambda _: None)
+    n_orders = 5
+    placed = threading.Barrier(n_orders)
+    queries = []
+
+    def query(method, data=None):
+        if method == "AddOrder":
+            placed.wait()
+            return {"result": {"txid": [data["price"]]}}
+        queries.append(method)
+        sleep(0.05)
+        if rate_limited:
+            raise ConnectionError("['EAPI:Rate limit exceeded']")
+        closed = {f"{i}.00000": {"fee": "0.1"} for i in range(n_orders)}
+        return {"result": {"closed": closed}}
+
+    with Kraken(live=True) as exchange:
+        monkeypatch.setattr(Kraken, "_decimals_cache", {"XRPEUR": (5, 8)})
+        monkeypatch.setattr(exchange.api, "api_key", "key")
+        monkeypatch.setattr(exchange.api, "api_secret", "secret")
+        monkeypatch.setattr(exchange.api, "query", query)
+
+        # a single status query follows up all the orders
+        rate_limited = False
+        orders = exchange.buy_many([("XRPEUR", 1, i) for i in range(n_orders)])
+        assert orders == [True] * n_orders
+        assert exchange.n_buy == n_orders
+        assert queries == ["ClosedOrders"]
+
+        # placed orders with an unknown status are not reported as not placed
+        rate_limited = True
+        with pytest.raises(OrderError) as err:
+            exchange.buy_many([("XRPEUR", 1, i) for i in range(n_orders)])
+        assert all(isinstance(order, ConnectionError) for order in err.value.processed)
+        assert exchange.n_buy == n_orders
+
+
+def test_market_price_future(monkeypatch):
+    queries = []
+
+    def query(method, data=None):
+        queries.append(method)
+        return {
+            "tickers": [
+                {"symbol": "pi_xbtusd", "last": 20000.0},
+                {"symbol": "pi_xrpusd", "last": 0.5},
+            ]
+        }
+
     with KrakenFuture() as exchange:
-        price = exchange.market_price("pi_xrpusd")
-        assert 0 < price < 100
+        monkeypatch.setattr(exchange.api, "query", query)
+
+        assert exchange.market_price("pi_xrpusd") == 0.5
+        assert exchange.market_price("pi_xbtusd") == 20000.0
+        assert queries == ["tickers"]
+
+        exchange.tickers_ttl = 0
+        exchange.market_price("pi_xrpusd")
+        assert queries == ["tickers", "tickers"]
+
+
+def test_order_decimals(monkeypatch):
+    monkeypatch.setattr("apophis.exchange.time.sleep", lambda _: None)
+    monkeypatch.setattr(Kraken, "_decimals_cache", {})
+    payloads = []
+
+    def query(method, data=None):
+        if method == "AssetPairs":
+            return {"result": {"XXRPZEUR": {"pair_decimals": 5, "lot_decimals": 8}}}
+        if method == "AddOrder":
+            payloads.append(data)
+            return {"result": {"txid": ["42"]}}
+        return {"result": {"closed": {"42": {"fee": "0.1"}}}}
+
+    with Kraken(live=True) as exchange:
+        monkeypatch.setattr(exchange.api, "api_key", "key")
+        monkeypatch.setattr(exchange.api, "api_secret", "secret")
+        monkeypatch.setattr(exchange.api, "query", query)
+
+        exchange.buy("XRPEUR", 0.1, 0.123456789)
+        assert payloads[0]["price"] == "0.12346"
+        assert payloads[0]["volume"] == "0.10000000"
+
+        # the volume is truncated, not rounded up
+        exchange.sell("XRPEUR", 0.123456789, 0.5)
+        assert payloads[1]["volume"] == "0.12345678"
+
+        exchange.sell("XRPEUR", 1e-5, 0.5)
+        assert payloads[2]["volume"] == "0.00001000"
+
+        # volumes taken from OHLC data
+        exchange.sell("XRPEUR", np.float64(0.1), 0.5)
+        assert payloads[3]["volume"] == "0.10000000"